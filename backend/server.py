@@ -1,33 +1,48 @@
 from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 from typing import List, Dict, Any, Optional
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 import tempfile
 import asyncio
-import pytesseract
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tesserocr import PyTessBaseAPI, PSM
 from PIL import Image
-import PyPDF2
+import pypdfium2 as pdfium
 import io
-import json
-
-# Import emergentintegrations for OpenAI
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from contextlib import closing
+import orjson
+import hashlib
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection. It only backs the caches, so an unreachable server is given up on
+# quickly rather than after pymongo's default 30s server selection timeout.
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, maxPoolSize=20, minPoolSize=5, serverSelectionTimeoutMS=2000)
 db = client[os.environ['DB_NAME']]
 
+# OpenAI client, shared across requests so HTTP connections are kept alive
+openai_api_key = os.environ.get('OPENAI_API_KEY')
+openai_client = AsyncOpenAI(
+    api_key=openai_api_key,
+    http_client=DefaultAsyncHttpxClient(limits=httpx.Limits(max_keepalive_connections=20))
+) if openai_api_key else None
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -41,6 +56,64 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Cache settings - bump PROMPT_VERSION whenever the prompt changes
+OPENAI_MODEL = "gpt-4o-mini"
+PROMPT_VERSION = "v3"
+CACHE_TTL = timedelta(days=7)
+# Cache reads and writes taking longer than this (in seconds) are abandoned
+CACHE_TIMEOUT = 1.0
+# After a cache call fails or times out, the cache is bypassed for this many seconds
+CACHE_COOLDOWN = 30.0
+# Monotonic time before which the cache is bypassed
+cache_retry_at = 0.0
+# Cache writes run in the background; keep references until they finish so they aren't collected
+CACHE_WRITES: "set[asyncio.Task]" = set()
+# Failed extractions are re-prompted with the validation error this many times in total
+LLM_MAX_ATTEMPTS = 3
+
+# Pool of preloaded Tesseract APIs, one per OCR worker thread. tesserocr releases
+# the GIL during recognition, so the workers run OCR in parallel.
+OCR_WORKERS = os.cpu_count() or 1
+OCR_POOL: "queue.Queue[PyTessBaseAPI]" = queue.Queue()
+EXECUTOR = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+# Images are downscaled so their long edge is at most this many pixels before OCR
+OCR_MAX_DIM = 2000
+
+# Only this much extracted text is sent to OpenAI, so extraction truncates to it
+MAX_LLM_CHARS = 4000
+
+# Uploads are read in chunks and capped at 10MB
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Most documents accepted by a single batch analysis request
+MAX_BATCH_FILES = 20
+
+# Upload request bodies larger than this are rejected, from Content-Length before any of
+# the body is read, or while it streams in. The allowance covers multipart boundaries and
+# part headers around the file bytes.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+UPLOAD_BODY_LIMITS = {
+    "/api/analyze-document": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+    "/api/analyze-documents": MAX_BATCH_FILES * (MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES),
+}
+
+# Magic bytes of the supported upload formats: PDF, PNG, JPEG, TIFF and BMP
+FILE_SIGNATURES = [
+    (b"%PDF-", "pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image"),
+    (b"\xff\xd8\xff", "image"),
+    (b"II*\x00", "image"),
+    (b"MM\x00*", "image"),
+    (b"BM", "image"),
+]
+FILE_SIGNATURE_BYTES = 16
+
+# PDF pages with less embedded text than this are treated as scanned and OCR'd
+MIN_PAGE_TEXT_CHARS = 50
+PDF_OCR_DPI = 200
+# PDFium is not thread-safe, so every call into it is serialised
+PDFIUM_LOCK = threading.Lock()
+
 # Models
 class DocumentAnalysisResult(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -52,20 +125,108 @@ class DocumentAnalysisResult(BaseModel):
     policy_amount: Optional[str] = None
     compliance_notes: List[str] = []
     processing_status: str = "completed"
+    # Why the document couldn't be analyzed, set when processing_status is "failed"
+    error: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 class DocumentAnalysisCreate(BaseModel):
     session_id: str
 
+class ExtractedFields(BaseModel):
+    """Fields extracted by OpenAI, used as a strict structured-output schema"""
+    # Strict mode requires every field to be required and no extra keys
+    model_config = ConfigDict(extra="forbid")
+    
+    effective_date: Optional[str]
+    insured_party: Optional[str]
+    underwriter: Optional[str]
+    legal_description: Optional[str]
+    exceptions: Optional[str]
+    policy_amount: Optional[str]
+
+EXTRACTION_SYSTEM_PROMPT = """You are a specialized document analyst for mortgage title insurance documents. 
+Your task is to extract specific information from title insurance or title policy documents.
+
+Extract the following 6 key fields:
+1. effective_date: The policy effective date
+2. insured_party: The name of the insured party/parties
+3. underwriter: The insurance company/underwriter name
+4. legal_description: The legal description of the property
+5. exceptions: Any exceptions or exclusions listed
+6. policy_amount: The policy coverage amount
+
+If any field is not found or unclear, return null for that field."""
+
+# The json_schema response format makes the API itself return valid JSON for ExtractedFields
+EXTRACTION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "extracted_fields",
+        "schema": ExtractedFields.model_json_schema(),
+        "strict": True
+    }
+}
+
 # Helper functions
+def ocr_image(image: Image.Image) -> str:
+    """Run Tesseract OCR on an image using a pooled API"""
+    # Let the JPEG decoder downscale and decode to grayscale directly where it can
+    image.draft('L', (OCR_MAX_DIM, OCR_MAX_DIM))
+    
+    # Tesseract works on grayscale, so hand it 8-bit grayscale directly
+    if image.mode != 'L':
+        image = image.convert('L')
+    
+    # OCR time grows with pixel count, and this is plenty for printed text
+    if max(image.size) > OCR_MAX_DIM:
+        image.thumbnail((OCR_MAX_DIM, OCR_MAX_DIM), Image.Resampling.LANCZOS)
+    
+    api = OCR_POOL.get()
+    try:
+        api.SetImage(image)
+        return api.GetUTF8Text()
+    finally:
+        OCR_POOL.put(api)
+
+def iter_pdf_page_texts(pdf_bytes: bytes):
+    """Yield the text of each PDF page, OCR'ing pages that have no usable text layer"""
+    with PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        page_count = len(pdf)
+    try:
+        for index in range(page_count):
+            image = None
+            with PDFIUM_LOCK:
+                page = pdf[index]
+                textpage = page.get_textpage()
+                # PDFium separates lines with CRLF
+                text = textpage.get_text_range().replace("\r\n", "\n")
+                textpage.close()
+                if len(text.strip()) < MIN_PAGE_TEXT_CHARS:
+                    image = page.render(scale=PDF_OCR_DPI / 72, grayscale=True).to_pil()
+                page.close()
+            # OCR runs outside the lock so other documents can use PDFium meanwhile
+            if image is not None:
+                text = ocr_image(image)
+            yield text
+    finally:
+        with PDFIUM_LOCK:
+            pdf.close()
+
 def extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    """Extract text from PDF using PyPDF2"""
+    """Extract text from PDF using PDFium, falling back to OCR for scanned pages"""
     try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        pages = []
+        length = 0
+        with closing(iter_pdf_page_texts(pdf_bytes)) as page_texts:
+            for text in page_texts:
+                pages.append(text + "\n")
+                length += len(text) + 1
+                # Only MAX_LLM_CHARS are sent on, so later pages needn't be parsed or OCR'd
+                if length >= MAX_LLM_CHARS:
+                    break
+        
+        return "".join(pages)[:MAX_LLM_CHARS]
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {e}")
         raise HTTPException(status_code=400, detail="Failed to extract text from PDF")
@@ -74,103 +235,238 @@ def extract_text_from_image(image_bytes: bytes) -> str:
     """Extract text from image using Tesseract OCR"""
     try:
         image = Image.open(io.BytesIO(image_bytes))
-        # Convert to RGB if needed
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Use Tesseract to extract text
-        text = pytesseract.image_to_string(image)
-        return text
+        return ocr_image(image)[:MAX_LLM_CHARS]
     except Exception as e:
         logger.error(f"Error extracting text from image: {e}")
         raise HTTPException(status_code=400, detail="Failed to extract text from image")
 
-async def analyze_document_with_openai(extracted_text: str, session_id: str) -> Dict[str, Any]:
-    """Analyze extracted text using OpenAI GPT-4o-mini"""
-    try:
-        # Get OpenAI API key from environment
-        openai_api_key = os.environ.get('OPENAI_API_KEY')
-        if not openai_api_key:
-            raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+def sniff_file_type(header: bytes) -> Optional[str]:
+    """Identify an upload as "pdf" or "image" from its magic bytes, or None if unsupported"""
+    for signature, file_type in FILE_SIGNATURES:
+        if header.startswith(signature):
+            return file_type
+    return None
 
-        # Create LlmChat instance for this session
-        chat = LlmChat(
-            api_key=openai_api_key,
-            session_id=session_id,
-            system_message="""You are a specialized document analyst for mortgage title insurance documents. 
-            Your task is to extract specific information from title insurance or title policy documents.
-            
-            Extract the following 6 key fields and return them in JSON format:
-            1. effective_date: The policy effective date
-            2. insured_party: The name of the insured party/parties
-            3. underwriter: The insurance company/underwriter name
-            4. legal_description: The legal description of the property
-            5. exceptions: Any exceptions or exclusions listed
-            6. policy_amount: The policy coverage amount
-            
-            If any field is not found or unclear, return null for that field.
-            Return ONLY valid JSON with these exact field names."""
-        ).with_model("openai", "gpt-4o-mini")
+async def read_upload(file: UploadFile) -> bytes:
+    """Read an upload in chunks, failing as soon as it exceeds the size limit"""
+    buffer = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buffer.extend(chunk)
+        if len(buffer) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=400, detail="File size exceeds 10MB limit")
+    return bytes(buffer)
+
+def cache_key(*parts: str) -> str:
+    """Build a SHA-256 cache key from length-prefixed parts so that part boundaries can't collide"""
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = part.encode()
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+def cache_available() -> bool:
+    """Whether the cache is in use, i.e. not cooling down after a recent failure"""
+    return time.monotonic() >= cache_retry_at
+
+def trip_cache_breaker(reason: str):
+    """Bypass the cache for CACHE_COOLDOWN so an outage doesn't slow every request"""
+    global cache_retry_at
+    if cache_available():
+        logger.warning(f"{reason} - bypassing the cache for {CACHE_COOLDOWN:.0f}s")
+    cache_retry_at = time.monotonic() + CACHE_COOLDOWN
+
+async def cache_lookup(collection, key: str) -> Optional[Dict[str, Any]]:
+    """Look up a cache entry, treating cache errors as a miss"""
+    if not cache_available():
+        return None
+    try:
+        return await asyncio.wait_for(collection.find_one({"_id": key}), CACHE_TIMEOUT)
+    except asyncio.TimeoutError:
+        trip_cache_breaker(f"Cache lookup in {collection.name} timed out after {CACHE_TIMEOUT}s")
+    except Exception as e:
+        trip_cache_breaker(f"Cache lookup in {collection.name} failed: {e}")
+    return None
 
-        # Create user message
-        user_message = UserMessage(
-            text=f"Please analyze this title insurance document text and extract the 6 key fields in JSON format:\n\n{extracted_text[:4000]}"  # Limit text length
+async def cache_store(collection, key: str, entry: Dict[str, Any]):
+    """Store a cache entry with a TTL, ignoring cache errors"""
+    if not cache_available():
+        return
+    now = datetime.utcnow()
+    try:
+        await asyncio.wait_for(
+            collection.replace_one(
+                {"_id": key},
+                {**entry, "createdAt": now, "expiresAt": now + CACHE_TTL},
+                upsert=True
+            ),
+            CACHE_TIMEOUT
         )
+    except asyncio.TimeoutError:
+        trip_cache_breaker(f"Cache write to {collection.name} timed out after {CACHE_TIMEOUT}s")
+    except Exception as e:
+        trip_cache_breaker(f"Cache write to {collection.name} failed: {e}")
+
+def schedule_cache_store(collection, key: str, entry: Dict[str, Any]):
+    """Store a cache entry in the background so the response doesn't wait on MongoDB"""
+    task = asyncio.create_task(cache_store(collection, key, entry))
+    CACHE_WRITES.add(task)
+    task.add_done_callback(CACHE_WRITES.discard)
 
-        # Send message and get response
-        response = await chat.send_message(user_message)
+async def analyze_document_with_openai(extracted_text: str, session_id: str) -> Optional[Dict[str, Any]]:
+    """Analyze extracted text using OpenAI GPT-4o-mini, or return None if every attempt was invalid"""
+    try:
+        # Serve repeated documents from the cache instead of calling OpenAI again
+        key = cache_key(OPENAI_MODEL, PROMPT_VERSION, extracted_text)
+        cached = await cache_lookup(db.llm_cache, key)
+        if cached:
+            try:
+                return orjson.loads(cached["response"])
+            except orjson.JSONDecodeError:
+                logger.warning(f"Ignoring corrupt LLM cache entry {key}")
+
+        if openai_client is None:
+            raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+
+        messages = [
+            {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": f"Please analyze this title insurance document text and extract the 6 key fields:\n\n{extracted_text}"
+            }
+        ]
         
-        # Try to parse JSON response
-        try:
-            result = json.loads(response)
-            return result
-        except json.JSONDecodeError:
-            # If response is not valid JSON, try to extract JSON from the response
-            import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group())
-                return result
-            else:
-                # Fallback: return empty result
-                return {
-                    "effective_date": None,
-                    "insured_party": None,
-                    "underwriter": None,
-                    "legal_description": None,
-                    "exceptions": None,
-                    "policy_amount": None
-                }
+        for attempt in range(LLM_MAX_ATTEMPTS):
+            response = await openai_client.chat.completions.create(
+                model=OPENAI_MODEL,
+                user=session_id,
+                messages=messages,
+                response_format=EXTRACTION_RESPONSE_FORMAT
+            )
+            content = response.choices[0].message.content or ""
+            
+            try:
+                fields = ExtractedFields.model_validate_json(content)
+                break
+            except ValidationError as e:
+                # Refusals or truncated output: feed the error back and ask again
+                logger.warning(f"OpenAI returned an invalid extraction (attempt {attempt + 1}): {e}")
+                if attempt == LLM_MAX_ATTEMPTS - 1:
+                    return None
+                messages.append({"role": "assistant", "content": content})
+                messages.append({
+                    "role": "user",
+                    "content": f"Your output had error: {e}. Fix it and return only the 6 key fields as valid JSON."
+                })
+                await asyncio.sleep(1.0 * (attempt + 1))
+        
+        result = fields.model_dump()
+        schedule_cache_store(db.llm_cache, key, {"response": orjson.dumps(result).decode(), "model": OPENAI_MODEL})
+        return result
                 
     except Exception as e:
         logger.error(f"Error analyzing document with OpenAI: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to analyze document: {str(e)}")
 
+# (field, note when present, note when missing) - None means no note
+COMPLIANCE_RULES = [
+    ("effective_date", None, "⚠️ Effective date not found - verify policy activation date"),
+    ("policy_amount", None, "⚠️ Policy amount not identified - confirm coverage limits"),
+    ("legal_description", None, "⚠️ Legal description missing - property boundaries may need verification"),
+    ("exceptions", "✓ Policy exceptions identified - review for potential issues", "ℹ️ No exceptions listed - standard coverage applies"),
+    ("underwriter", "✓ Underwriter identified - policy issuer confirmed", None),
+]
+
 def generate_compliance_notes(analysis_result: Dict[str, Any]) -> List[str]:
     """Generate predefined compliance notes based on analysis"""
-    notes = []
+    notes = [
+        note
+        for field, present_note, missing_note in COMPLIANCE_RULES
+        if (note := present_note if analysis_result.get(field) else missing_note)
+    ]
     
-    if not analysis_result.get("effective_date"):
-        notes.append("⚠️ Effective date not found - verify policy activation date")
+    # Add general compliance note
+    notes.append("📋 Document processed - review all fields for accuracy")
+    
+    return notes
+
+async def process_document(file: UploadFile) -> DocumentAnalysisResult:
+    """Run one uploaded document through validation, text extraction and analysis"""
+    # Validate file type from its leading bytes, since the client's content type can't be trusted
+    file_type = sniff_file_type(await file.read(FILE_SIGNATURE_BYTES))
+    if file_type is None:
+        raise HTTPException(
+            status_code=400, 
+            detail="Unsupported file type. Please upload PDF or image files."
+        )
+    await file.seek(0)
     
-    if not analysis_result.get("policy_amount"):
-        notes.append("⚠️ Policy amount not identified - confirm coverage limits")
+    # Read file content, rejecting anything over the size limit
+    file_content = await read_upload(file)
     
-    if not analysis_result.get("legal_description"):
-        notes.append("⚠️ Legal description missing - property boundaries may need verification")
+    # Byte-identical re-uploads skip text extraction and analysis entirely
+    doc_key = cache_key(OPENAI_MODEL, PROMPT_VERSION, hashlib.sha256(file_content).hexdigest())
+    cached = await cache_lookup(db.doc_cache, doc_key)
+    if cached:
+        return DocumentAnalysisResult(**cached["fields"])
     
-    if analysis_result.get("exceptions"):
-        notes.append("✓ Policy exceptions identified - review for potential issues")
+    # Extract text based on file type, off the event loop since extraction blocks
+    if file_type == "pdf":
+        extract_text = extract_text_from_pdf
     else:
-        notes.append("ℹ️ No exceptions listed - standard coverage applies")
+        extract_text = extract_text_from_image
+    extracted_text = await asyncio.get_running_loop().run_in_executor(
+        EXECUTOR, extract_text, file_content
+    )
     
-    if analysis_result.get("underwriter"):
-        notes.append("✓ Underwriter identified - policy issuer confirmed")
+    if not extracted_text.strip():
+        raise HTTPException(status_code=400, detail="No text could be extracted from the document")
     
-    # Add general compliance note
-    notes.append("📋 Document processed - review all fields for accuracy")
+    # Generate session ID for this analysis
+    session_id = str(uuid.uuid4())
     
-    return notes
+    # Analyze with OpenAI, falling back to empty fields if it never returned a valid extraction
+    analysis_result = await analyze_document_with_openai(extracted_text, session_id)
+    extraction_failed = analysis_result is None
+    if extraction_failed:
+        analysis_result = dict.fromkeys(ExtractedFields.model_fields)
+    
+    # Generate compliance notes
+    compliance_notes = generate_compliance_notes(analysis_result)
+    
+    # Create result object
+    result = DocumentAnalysisResult(
+        effective_date=analysis_result.get("effective_date"),
+        insured_party=analysis_result.get("insured_party"),
+        underwriter=analysis_result.get("underwriter"),
+        legal_description=analysis_result.get("legal_description"),
+        exceptions=analysis_result.get("exceptions"),
+        policy_amount=analysis_result.get("policy_amount"),
+        compliance_notes=compliance_notes,
+        processing_status="completed"
+    )
+    
+    # A failed extraction may well succeed on a retry, so it must not be cached
+    if not extraction_failed:
+        schedule_cache_store(db.doc_cache, doc_key, {"fields": result.model_dump(exclude={"id", "timestamp"})})
+    
+    # Store result in database (optional - since tool should be stateless)
+    # await db.document_analysis.insert_one(result.dict())
+    
+    return result
+
+async def process_batch_document(file: UploadFile) -> DocumentAnalysisResult:
+    """Process one document of a batch, reporting a failure in its result instead of failing the batch"""
+    try:
+        return await process_document(file)
+    except HTTPException as e:
+        return DocumentAnalysisResult(processing_status="failed", error=e.detail)
+    except Exception as e:
+        logger.error(f"Unexpected error analyzing {file.filename} in batch: {e}")
+        return DocumentAnalysisResult(
+            processing_status="failed",
+            error="Internal server error during document analysis"
+        )
 
 # API Routes
 @api_router.get("/")
@@ -181,67 +477,25 @@ async def root():
 async def analyze_document(file: UploadFile = File(...)):
     """Analyze uploaded mortgage document (PDF or image)"""
     try:
-        # Validate file size (10MB max)
-        if file.size and file.size > 10 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="File size exceeds 10MB limit")
-        
-        # Validate file type
-        allowed_types = [
-            "application/pdf",
-            "image/jpeg", "image/jpg", "image/png", "image/tiff", "image/bmp"
-        ]
-        
-        if file.content_type not in allowed_types:
-            raise HTTPException(
-                status_code=400, 
-                detail="Unsupported file type. Please upload PDF or image files."
-            )
-        
-        # Read file content
-        file_content = await file.read()
-        
-        # Extract text based on file type
-        extracted_text = ""
-        if file.content_type == "application/pdf":
-            extracted_text = extract_text_from_pdf(file_content)
-        else:
-            extracted_text = extract_text_from_image(file_content)
-        
-        if not extracted_text.strip():
-            raise HTTPException(status_code=400, detail="No text could be extracted from the document")
-        
-        # Generate session ID for this analysis
-        session_id = str(uuid.uuid4())
-        
-        # Analyze with OpenAI
-        analysis_result = await analyze_document_with_openai(extracted_text, session_id)
-        
-        # Generate compliance notes
-        compliance_notes = generate_compliance_notes(analysis_result)
-        
-        # Create result object
-        result = DocumentAnalysisResult(
-            effective_date=analysis_result.get("effective_date"),
-            insured_party=analysis_result.get("insured_party"),
-            underwriter=analysis_result.get("underwriter"),
-            legal_description=analysis_result.get("legal_description"),
-            exceptions=analysis_result.get("exceptions"),
-            policy_amount=analysis_result.get("policy_amount"),
-            compliance_notes=compliance_notes,
-            processing_status="completed"
-        )
-        
-        # Store result in database (optional - since tool should be stateless)
-        # await db.document_analysis.insert_one(result.dict())
-        
-        return result
-        
+        return await process_document(file)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Unexpected error in document analysis: {e}")
         raise HTTPException(status_code=500, detail="Internal server error during document analysis")
 
+@api_router.post("/analyze-documents", response_model=List[DocumentAnalysisResult])
+async def analyze_documents(files: List[UploadFile] = File(...)):
+    """Analyze several uploaded mortgage documents concurrently"""
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files. Please upload at most {MAX_BATCH_FILES} documents at once."
+        )
+    
+    # Extraction runs in parallel on the worker pool and OpenAI calls overlap
+    return await asyncio.gather(*(process_batch_document(file) for file in files))
+
 @api_router.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -250,13 +504,63 @@ async def health_check():
         "timestamp": datetime.utcnow(),
         "services": {
             "tesseract": "available",
-            "openai": "configured" if os.environ.get('OPENAI_API_KEY') else "not configured"
+            "openai": "configured" if openai_client else "not configured"
         }
     }
 
 # Include the router in the main app
 app.include_router(api_router)
 
+class UploadSizeLimitMiddleware:
+    """Cap the request body of the upload endpoints while it is received.
+
+    FastAPI parses multipart forms, spooling every file to disk, before the handler
+    runs, so read_upload alone can't stop an oversized upload from being received
+    in full. Bodies declaring too large a Content-Length are rejected before any of
+    it is read, and the bytes actually received are counted so that chunked or
+    under-declared bodies are cut off as soon as they pass the limit.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        limit = UPLOAD_BODY_LIMITS.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            # The unread body makes the connection unusable, so close it
+            response = JSONResponse(
+                status_code=400,
+                content={"detail": "File size exceeds 10MB limit"},
+                headers={"Connection": "close"}
+            )
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPExceptions from body parsing as the response
+                    raise HTTPException(
+                        status_code=400,
+                        detail="File size exceeds 10MB limit",
+                        headers={"Connection": "close"}
+                    )
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -265,6 +569,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def init_ocr_pool():
+    for _ in range(OCR_WORKERS):
+        OCR_POOL.put(PyTessBaseAPI(psm=PSM.AUTO))
+
+@app.on_event("startup")
+async def check_openai_config():
+    if openai_client is None:
+        logger.warning("OPENAI_API_KEY is not set - document analysis requests will fail")
+
+@app.on_event("startup")
+async def warm_db_connection():
+    # Connect before the first request instead of on its first cache lookup
+    try:
+        await db.command("ping")
+    except Exception as e:
+        logger.warning(f"MongoDB is not reachable: {e}")
+
+@app.on_event("startup")
+async def create_cache_indexes():
+    # Let MongoDB evict cache entries once their expiresAt has passed
+    try:
+        await db.llm_cache.create_index("expiresAt", expireAfterSeconds=0)
+        await db.doc_cache.create_index("expiresAt", expireAfterSeconds=0)
+    except Exception as e:
+        logger.warning(f"Could not create cache indexes: {e}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    # Let pending cache writes finish before the connection goes away
+    if CACHE_WRITES:
+        await asyncio.wait(CACHE_WRITES, timeout=CACHE_TIMEOUT)
+    client.close()
+
+@app.on_event("shutdown")
+async def shutdown_openai_client():
+    if openai_client is not None:
+        await openai_client.close()
+
+@app.on_event("shutdown")
+async def shutdown_ocr_pool():
+    EXECUTOR.shutdown(wait=True)
+    while not OCR_POOL.empty():
+        OCR_POOL.get_nowait().End()
\ No newline at end of file
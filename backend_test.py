@@ -13,6 +13,7 @@ import tempfile
 from PIL import Image, ImageDraw, ImageFont
 import io
 import time
+import numpy as np
 from fpdf import FPDF
 
 # Get backend URL from frontend .env file
@@ -140,10 +141,11 @@ def create_sample_image_with_mortgage_content():
 def create_large_file():
     """Create a file larger than 10MB for testing size limits"""
     buffer = io.BytesIO()
-    # Create a large image (should be > 10MB)
-    large_img = Image.new('RGB', (5000, 5000), color='white')
-    large_img.save(buffer, format='PNG')
-    buffer.seek(0)
+    # White grayscale canvas with a black line every 100 rows, written in one
+    # strided NumPy op; stored uncompressed so the PNG stays > 10MB (~16MB)
+    pixels = np.full((4000, 4000), 255, dtype=np.uint8)
+    pixels[::100] = 0
+    Image.fromarray(pixels).save(buffer, format='PNG', compress_level=0)
     return buffer.getvalue()
 
 def test_health_endpoint():
@@ -294,6 +296,71 @@ def test_empty_file():
     except Exception as e:
         results.add_result("Empty file test - exception", False, str(e))
 
+def test_batch_upload():
+    """Test analyzing a valid PDF and a valid image in one batch request"""
+    try:
+        files = [
+            ('files', ('test_mortgage.pdf', create_sample_pdf_with_mortgage_content(), 'application/pdf')),
+            ('files', ('test_mortgage.png', create_sample_image_with_mortgage_content(), 'image/png')),
+        ]
+        
+        response = requests.post(f"{API_BASE}/analyze-documents", files=files, timeout=60)
+        
+        if response.status_code == 200:
+            data = response.json()
+            statuses = [item.get('processing_status') for item in data] if isinstance(data, list) else data
+            if statuses == ['completed', 'completed']:
+                results.add_result("Batch upload - success", True)
+            else:
+                results.add_result("Batch upload - unexpected results", False, f"Statuses: {statuses}")
+        else:
+            results.add_result("Batch upload - HTTP error", False, f"Status: {response.status_code}, Response: {response.text}")
+    except Exception as e:
+        results.add_result("Batch upload - exception", False, str(e))
+
+def test_batch_partial_failure():
+    """Test that an unsupported file only fails its own entry in a batch"""
+    try:
+        files = [
+            ('files', ('test_mortgage.pdf', create_sample_pdf_with_mortgage_content(), 'application/pdf')),
+            ('files', ('test.txt', b"This is a text file, not a PDF or image", 'text/plain')),
+        ]
+        
+        response = requests.post(f"{API_BASE}/analyze-documents", files=files, timeout=60)
+        
+        if response.status_code == 200:
+            data = response.json()
+            if (isinstance(data, list) and len(data) == 2
+                    and data[0].get('processing_status') == 'completed'
+                    and data[1].get('processing_status') == 'failed'
+                    and "Unsupported file type" in (data[1].get('error') or "")):
+                results.add_result("Batch partial failure - success", True)
+            else:
+                results.add_result("Batch partial failure - unexpected results", False, f"Response: {response.text}")
+        else:
+            results.add_result("Batch partial failure - HTTP error", False, f"Status: {response.status_code}, Response: {response.text}")
+    except Exception as e:
+        results.add_result("Batch partial failure - exception", False, str(e))
+
+def test_batch_file_limit():
+    """Test that batches of more than 20 files are rejected"""
+    try:
+        pdf_content = create_sample_pdf_with_mortgage_content()
+        files = [('files', (f'test_mortgage_{i}.pdf', pdf_content, 'application/pdf')) for i in range(21)]
+        
+        response = requests.post(f"{API_BASE}/analyze-documents", files=files, timeout=30)
+        
+        if response.status_code == 400:
+            data = response.json()
+            if "Too many files" in data.get("detail", ""):
+                results.add_result("Batch file limit enforcement - success", True)
+            else:
+                results.add_result("Batch file limit - wrong error message", False, f"Detail: {data.get('detail')}")
+        else:
+            results.add_result("Batch file limit - not enforced", False, f"Status: {response.status_code}")
+    except Exception as e:
+        results.add_result("Batch file limit test - exception", False, str(e))
+
 def test_compliance_notes_generation():
     """Test that compliance notes are generated properly"""
     try:
@@ -400,6 +467,15 @@ def main():
     print("\nTesting empty file handling...")
     test_empty_file()
     
+    print("\nTesting batch upload...")
+    test_batch_upload()
+    
+    print("\nTesting batch partial failure...")
+    test_batch_partial_failure()
+    
+    print("\nTesting batch file limit...")
+    test_batch_file_limit()
+    
     # Print summary
     results.summary()
     
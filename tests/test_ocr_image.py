@@ -0,0 +1,87 @@
+"""Unit tests for the image preprocessing done before Tesseract OCR"""
+import io
+import os
+import queue
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+# The MongoDB client connects lazily, so placeholder settings are enough to import the server
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+
+import server  # noqa: E402
+from backend_test import create_sample_image_with_mortgage_content  # noqa: E402
+
+
+class RecordingApi:
+    """Stands in for a pooled PyTessBaseAPI and records the images it is given"""
+
+    def __init__(self):
+        self.images = []
+
+    def SetImage(self, image):
+        self.images.append(image)
+
+    def GetUTF8Text(self):
+        return "TITLE INSURANCE POLICY"
+
+
+@pytest.fixture
+def ocr_api(monkeypatch):
+    api = RecordingApi()
+    pool = queue.Queue()
+    pool.put(api)
+    monkeypatch.setattr(server, "OCR_POOL", pool)
+    return api
+
+
+def sample_image(mode):
+    return Image.open(io.BytesIO(create_sample_image_with_mortgage_content())).convert(mode)
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_ocr_image_hands_tesseract_grayscale(ocr_api, mode):
+    image = sample_image(mode)
+
+    assert server.ocr_image(image) == "TITLE INSURANCE POLICY"
+
+    (ocr_input,) = ocr_api.images
+    assert ocr_input.mode == "L"
+    # Within OCR_MAX_DIM, so the size is left alone
+    assert ocr_input.size == image.size
+
+
+def test_extract_text_from_image_decodes_to_grayscale(ocr_api):
+    server.extract_text_from_image(create_sample_image_with_mortgage_content())
+
+    (ocr_input,) = ocr_api.images
+    assert ocr_input.mode == "L"
+
+
+def test_ocr_image_downscales_oversized_images(ocr_api):
+    image = sample_image("RGB").resize((5000, 3750))
+
+    server.ocr_image(image)
+
+    (ocr_input,) = ocr_api.images
+    assert ocr_input.mode == "L"
+    assert ocr_input.size == (server.OCR_MAX_DIM, 1500)
+
+
+def test_ocr_image_downscales_oversized_jpegs(ocr_api):
+    buffer = io.BytesIO()
+    sample_image("RGB").resize((5000, 3750)).save(buffer, format="JPEG")
+    image = Image.open(io.BytesIO(buffer.getvalue()))
+
+    server.ocr_image(image)
+
+    (ocr_input,) = ocr_api.images
+    assert ocr_input.mode == "L"
+    assert max(ocr_input.size) == server.OCR_MAX_DIM